@@ -2,26 +2,63 @@
 Query dispatcher for earthaccess and pystac_client
 """
 
-from typing import Any, Dict, List, Optional
+import logging
+import re
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 import earthaccess
 from pydantic import BaseModel
 from pystac_client import Client
+from pystac_client.stac_api_io import StacApiIO
+from requests.adapters import HTTPAdapter
 
-from urllib.parse import urlparse
+logger = logging.getLogger(__name__)
 
-import logging
-import traceback
+# http(s) scheme followed by a non-empty netloc, same acceptance as urlparse
+_URL_RE = re.compile(r"^https?://[^/?#\s]+", re.IGNORECASE)
 
-logger = logging.getLogger(__name__)
+_STOPWORDS = frozenset({"the", "and", "from", "over", "near", "in", "at", "of", "data", "for"})
+MAX_KEYWORDS = 5
+
+# Seconds per STAC request, pystac-client waits indefinitely by default and a
+# stalled catalog would otherwise hold a search worker forever
+STAC_TIMEOUT = 30
 
 
 def is_valid_url(url: str) -> bool:
-    try:
-        result = urlparse(url)
-        return all([result.scheme in ("http", "https"), result.netloc])
-    except Exception:
-        return False
+    return isinstance(url, str) and _URL_RE.match(url) is not None
+
+
+def normalize_keywords(keywords: List[str], max_keywords: int = MAX_KEYWORDS) -> List[str]:
+    """Lowercase tokens split from a free-text query, dropping stopwords, very short tokens and duplicates"""
+    normalized = (k.strip().lower() for k in keywords)
+    unique = dict.fromkeys(k for k in normalized if len(k) > 2 and k not in _STOPWORDS)
+    return list(unique)[:max_keywords]
+
+
+def _pooled_stac_io() -> StacApiIO:
+    """StacApiIO whose session keeps connections alive across searches"""
+    stac_io = StacApiIO(timeout=STAC_TIMEOUT)
+    # Keep the retry policy of the adapter StacApiIO installed, only the keep-alive pool grows
+    retries = stac_io.session.get_adapter("https://").max_retries
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retries)
+    stac_io.session.mount("http://", adapter)
+    stac_io.session.mount("https://", adapter)
+    return stac_io
+
+
+# One connection pool shared by every catalog and QueryDispatcher instance
+_STAC_IO = _pooled_stac_io()
+
+
+@lru_cache(maxsize=8)
+def _open_catalog(catalog_url: str) -> Client:
+    """Open a STAC catalog once and reuse the parsed root for later searches"""
+    # Client.open pushes its own timeout onto the shared StacApiIO, so pass ours every time
+    return Client.open(catalog_url, stac_io=_STAC_IO, timeout=STAC_TIMEOUT)
 
 
 class Link(BaseModel):
@@ -40,22 +77,21 @@ class DatasetSummary(BaseModel):
 
 def format_nasa_dataset(result) -> DatasetSummary:
     try:
-        links = []
-        for l in result.get_umm("RelatedUrls") or []:
-            if "URL" in l and "Type" in l:
-                links.append(Link(url=l["URL"], rel=l["Type"]))
+        related_urls = result.get_umm("RelatedUrls") or []
+        doi_section = result.get_umm("DOI") or {}
+        title = result.get_umm("EntryTitle") or ""
+
+        links = [Link.model_construct(url=l["URL"], rel=l["Type"]) for l in related_urls if "URL" in l and "Type" in l]
 
         summary_text = result.abstract()
-        if "DOI" in result.get_umm("DOI"):
-            doi = str(result.get_umm("DOI")["DOI"])
-        else:
-            doi = "Unavailable"
+        doi = str(doi_section["DOI"]) if "DOI" in doi_section else "Unavailable"
 
-        return DatasetSummary(
+        # Fields come straight from the UMM record shape, skip re-validating them
+        return DatasetSummary.model_construct(
             source="NASA CMR",
             id=result.concept_id(),
             doi=doi,
-            title=result.get_umm("EntryTitle") or "",
+            title=title,
             summary=summary_text[:500],
             links=links,
         )
@@ -71,16 +107,12 @@ def format_stac_dataset(result) -> DatasetSummary:
     Args:
         dataset: A DatasetSummary object from earthaccess
     """
-    return DatasetSummary(
+    return DatasetSummary.model_construct(
         source="STAC",
         id=result.id,
-        title=result.title,
+        title=result.title or "",
         summary=result.description[0:500],
-        links=[
-            Link(url=link.target, rel=link.rel)
-            for link in result.links
-            if is_valid_url(link.target)
-        ],
+        links=[Link.model_construct(url=link.target, rel=link.rel) for link in result.links if is_valid_url(link.target)],
     )
 
 
@@ -119,6 +151,7 @@ class QueryDispatcher:
         bbox: Optional[tuple] = None,
         temporal: Optional[tuple] = None,
         count: Optional[int] = 10,
+        authenticate: bool = True,
         **kwargs,
     ) -> List[DatasetSummary]:
         """
@@ -128,6 +161,7 @@ class QueryDispatcher:
             keyword: a string with search keywords e.g. "water quality" or "vegetation index"
             bbox: Bounding box as (min_lon, min_lat, max_lon, max_lat)
             temporal: Temporal range as (start_date, end_date)
+            authenticate: Log in first if not authenticated, callers that already did pass False
             **kwargs: Additional search parameters
 
         Returns:
@@ -135,7 +169,7 @@ class QueryDispatcher:
         """
         try:
             # Try to authenticate if not already done
-            if not self.auth.authenticated:
+            if authenticate and not self.auth.authenticated:
                 self.authenticate_earthaccess()
 
             search_params = {}
@@ -155,12 +189,15 @@ class QueryDispatcher:
             search_params.update(kwargs)
             search_params["count"] = count
 
-            logger.info(f"Earthaccess search parameters: {search_params}")
+            logger.info("Earthaccess search parameters: %s", search_params)
 
             results = earthaccess.search_datasets(**search_params)
             collections = []
+            # Checked once so the per-result message is not built when INFO is off
+            log_results = logger.isEnabledFor(logging.INFO)
             for result in results:
-                logger.info(f"Found Earthaccess dataset: {result.concept_id()}")
+                if log_results:
+                    logger.info("Found Earthaccess dataset: %s", result.concept_id())
                 collections.append(format_nasa_dataset(result))
 
             return collections
@@ -195,7 +232,7 @@ class QueryDispatcher:
             if not catalog_url:
                 catalog_url = self.STAC_CATALOGS["maap"]
 
-            catalog = Client.open(catalog_url)
+            catalog = _open_catalog(catalog_url)
 
             # Build search parameters
             search_params = {}
@@ -215,15 +252,17 @@ class QueryDispatcher:
                 search_params["datetime"] = datetime
 
             search_params.update(kwargs)
-            logger.info(f"STAC search parameters: {search_params}")
+            logger.info("STAC search parameters: %s", search_params)
 
             search = catalog.collection_search(**search_params)
 
             collections = []
             result_count = search.matched()
-            logger.info(f"STAC search found {result_count} collections")
+            logger.info("STAC search found %s collections", result_count)
+            log_results = logger.isEnabledFor(logging.INFO)
             for result in search.collection_list():
-                logger.info(f"Found STAC collection: {result.id}")
+                if log_results:
+                    logger.info("Found STAC collection: %s", result.id)
                 collections.append(format_stac_dataset(result))
 
             return collections
@@ -250,17 +289,18 @@ class QueryDispatcher:
         """
 
         bbox = params.get("bbox")
-        geolocated_corrected_bbox = bbox
-        if geolocated_corrected_bbox != bbox:
-            logger.info(
-                f"The extracted bbox does not agree with the geolocated bbox. Using LLM {geolocated_corrected_bbox} instead of {bbox}"
-            )
-            bbox = geolocated_corrected_bbox
-
         temporal = params.get("temporal", {})
 
+        if keywords:
+            # Terms chosen by the agent are kept as given, short variable names like "O3" included
+            keywords = list(dict.fromkeys(k.strip().lower() for k in keywords if k.strip()))
+        else:
+            # Every keyword is a search per source, so drop noise words and repeats from the raw query
+            query_tokens = params.get("query", "").split()
+            keywords = normalize_keywords(query_tokens) or query_tokens
+
         if not keywords:
-            keywords = params.get("query").split()
+            return []
 
         temporal_tuple = None
         datetime_str = None
@@ -272,19 +312,22 @@ class QueryDispatcher:
                 temporal_tuple = (start, end)
                 datetime_str = f"{start}/{end}" if end else start
 
-        results_earthaccess = []
-        results_stac = []
+        searches = []
 
         if source in ("nasa", "all"):
-            try:
-                for keyword in keywords:
-                    results_earthaccess.extend(
-                        self.search_earthaccess_collections(
-                            keyword=keyword, bbox=bbox, temporal=temporal_tuple, count=max_results
-                        )
+            # Authenticate once up front rather than from every worker thread
+            if not getattr(self, "auth", None) or not self.auth.authenticated:
+                self.authenticate_earthaccess()
+            # CMR keyword search ANDs its terms, so each keyword needs its own request
+            for keyword in keywords:
+                searches.append(
+                    (
+                        "earthaccess",
+                        self.search_earthaccess_collections,
+                        # Workers must not retry the login concurrently if it failed above
+                        dict(keyword=keyword, bbox=bbox, temporal=temporal_tuple, count=max_results, authenticate=False),
                     )
-            except Exception as e:
-                logger.error(f"Error searching earthaccess: {e}")
+                )
 
         if source in (
             "maap",
@@ -292,14 +335,43 @@ class QueryDispatcher:
             "stac",
             "esa",
         ):
-            try:
-                for keyword in keywords:
-                    results_stac.extend(
-                        self.search_stac_collections(
-                            keywords=keyword, bbox=bbox, datetime=datetime_str, limit=max_results
-                        )
-                    )
-            except Exception as e:
-                logger.error(f"Error searching STAC: {e}")
+            # Free-text search ORs the keywords, so one request returns the union
+            searches.append(
+                (
+                    "STAC",
+                    self.search_stac_collections,
+                    dict(keywords=keywords, bbox=bbox, datetime=datetime_str, limit=max_results),
+                )
+            )
+
+        if not searches:
+            return []
 
-        return results_earthaccess + results_stac
+        # The same collection often matches several keywords, keep the first hit only
+        results: Dict[Tuple[str, str], DatasetSummary] = {}
+        found_per_source = dict.fromkeys((name for name, _, _ in searches), 0)
+
+        # Each search is an independent HTTPS round trip, run them concurrently and
+        # collect in submission order so results stay grouped per source and keyword
+        with ThreadPoolExecutor(max_workers=min(16, len(searches))) as executor:
+            futures = [(name, executor.submit(search, **kwargs)) for name, search, kwargs in searches]
+            for name, future in futures:
+                # max_results applies per source, skip searches that can no longer contribute
+                if found_per_source[name] >= max_results:
+                    future.cancel()
+                    continue
+                try:
+                    datasets = future.result()
+                except Exception as e:
+                    logger.error(f"Error searching {name}: {e}")
+                    continue
+                for dataset in datasets:
+                    # format_nasa_dataset returns an empty dict for records it could not format
+                    if not isinstance(dataset, DatasetSummary):
+                        continue
+                    key = (dataset.source, dataset.id)
+                    if key not in results and found_per_source[name] < max_results:
+                        results[key] = dataset
+                        found_per_source[name] += 1
+
+        return list(results.values())
@@ -1,16 +1,31 @@
 import logging
 import os
 import re
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Tuple
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
 
 import requests
 from dateutil import parser as date_parser
 from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+GEOCODING_TIMEOUT = 10
+
+_ISO_RE = re.compile(r"^\s*(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?\s*$")
+
+
+def _fast_parse(value: str) -> datetime:
+    """Parse YYYY, YYYY-MM or YYYY-MM-DD directly, falling back to fuzzy dateutil parsing"""
+    match = _ISO_RE.match(value)
+    if match:
+        year, month, day = match.groups()
+        return datetime(int(year), int(month or 1), int(day or 1))
+    return date_parser.parse(value, fuzzy=True)
+
 
 class SpatiotemporalParameters(BaseModel):
     location: Optional[str] = None
@@ -23,22 +38,33 @@ class SpatiotemporalParameters(BaseModel):
 class SpatiotemporalExtractor:
     """Extract spatiotemporal parameters from natural language queries"""
 
+    # Patterns within a category are tried in order, each over the whole query, so an
+    # earlier pattern wins even when a later one matches further to the left
     LOCATION_PATTERNS = [
-        r"in\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)",
-        r"over\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)",
-        r"at\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)",
-        r"near\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)",
+        re.compile(p)
+        for p in (
+            r"in\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)",
+            r"over\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)",
+            r"at\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)",
+            r"near\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)",
+        )
     ]
 
     COORDINATE_PATTERNS = [
-        r"(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)",
-        r"lat[itude]*[:=\s]+(-?\d+(?:\.\d+)?)[,\s]+lon[gitude]*[:=\s]+(-?\d+(?:\.\d+)?)",
-        r"(-?\d+(?:\.\d+)?)\s*[NS]\s*,?\s*(-?\d+(?:\.\d+)?)\s*[EW]",
+        re.compile(p, re.IGNORECASE)
+        for p in (
+            r"(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)",
+            r"lat[itude]*[:=\s]+(-?\d+(?:\.\d+)?)[,\s]+lon[gitude]*[:=\s]+(-?\d+(?:\.\d+)?)",
+            r"(-?\d+(?:\.\d+)?)\s*[NS]\s*,?\s*(-?\d+(?:\.\d+)?)\s*[EW]",
+        )
     ]
 
     BBOX_PATTERNS = [
-        r"bbox\s*(?:[:=]\s*)?\[?\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*\]?",
-        r"bounds?\s*(?:[:=]\s*)?\[?\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*\]?",
+        re.compile(p, re.IGNORECASE)
+        for p in (
+            r"bbox\s*(?:[:=]\s*)?\[?\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*\]?",
+            r"bounds?\s*(?:[:=]\s*)?\[?\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*\]?",
+        )
     ]
 
     TEMPORAL_KEYWORDS = {
@@ -49,21 +75,35 @@ class SpatiotemporalExtractor:
         "last year": -365,
     }
 
+    # (tag, pattern) pairs searched in order, the tag selects how the captured dates are interpreted.
+    # Kept separate rather than fused: the greedy since/after/before/during captures would
+    # otherwise swallow a later from/between expression and hide it from a single scan
     DATE_RANGE_PATTERNS = [
-        r"from\s+([\w\s,\-:]+?)\s+to\s+([\w\s,\-:]+)",
-        r"between\s+([\w\s,\-:]+?)\s+and\s+([\w\s,\-:]+)",
-        r"since\s+([\w\s,\-:]+)",
-        r"after\s+([\w\s,\-:]+)",
-        r"before\s+([\w\s,\-:]+)",
-        r"in\s+(\d{4})",
-        r"during\s+([\w\s,\-:]+)",
+        (tag, re.compile(p, re.IGNORECASE))
+        for tag, p in (
+            ("from", r"from\s+([\w\s,\-:]+?)\s+to\s+([\w\s,\-:]+)"),
+            ("between", r"between\s+([\w\s,\-:]+?)\s+and\s+([\w\s,\-:]+)"),
+            ("since", r"since\s+([\w\s,\-:]+)"),
+            ("after", r"after\s+([\w\s,\-:]+)"),
+            ("before", r"before\s+([\w\s,\-:]+)"),
+            ("in", r"in\s+(\d{4})"),
+            ("during", r"during\s+([\w\s,\-:]+)"),
+        )
     ]
 
+    YEAR_PATTERN = re.compile(r"^\d{4}$")
+
     def __init__(self):
         """Initialize the extractor"""
         self.geocoding_api_key = os.getenv("GEOCODING_API_KEY", None)
         self.geocoding_location_url = "https://api.geoapify.com/v1/geocode/search"
         self.geocoding_place_details = "https://api.geoapify.com/v2/place-details"
+        # Reuse connections to the geocoding API and remember places already resolved
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self._geocode = lru_cache(maxsize=1024)(self._geocode_location)
+        # Agents tend to re-issue the same query, memoize the regex-only extraction
+        self._extract_query_parameters_cached = lru_cache(maxsize=2048)(self._extract_query_parameters)
 
     def extract_location(self, query: str) -> Optional[str]:
         """
@@ -76,32 +116,39 @@ class SpatiotemporalExtractor:
             Location name if found, None otherwise
         """
         for pattern in self.LOCATION_PATTERNS:
-            match = re.search(pattern, query)
+            match = pattern.search(query)
             if match:
                 return match.group(1)
         return None
 
     def extract_geolocation_bbox(self, location: str) -> Optional[list[float]]:
         """
-        Placeholder for geocoding location names to coordinates.
-        In a real implementation, this would call a geocoding API.
+        Geocode a location name to its bounding box using the geoapify API.
+        Lookups are cached on the normalized name, so "California " and
+        "california" share one entry.
 
         Args:
             location: Location name string
         Returns:
-            List of [latitude, longitude] if found, None otherwise
+            Bounding box as [min_lon, min_lat, max_lon, max_lat] if found, None otherwise
         """
-
-        url = f"{self.geocoding_location_url}?text={location}&apiKey={self.geocoding_api_key}"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        first_feature = data.get("features", [])[0]
-        if first_feature:
-            bbox = first_feature.get("bbox")
-            return bbox
-        else:
+        key = location.strip().lower()
+        if not key:
             return None
+        bbox = self._geocode(key)
+        return list(bbox) if bbox else None
+
+    def _geocode_location(self, location: str) -> Optional[tuple[float, ...]]:
+        response = self._session.get(
+            self.geocoding_location_url,
+            params={"text": location, "apiKey": self.geocoding_api_key},
+            timeout=GEOCODING_TIMEOUT,
+        )
+        response.raise_for_status()
+        features = response.json().get("features") or []
+        if features and features[0].get("bbox"):
+            return tuple(features[0]["bbox"])
+        return None
 
     def extract_coordinates(self, query: str) -> Optional[Tuple[float, float]]:
         """
@@ -114,11 +161,10 @@ class SpatiotemporalExtractor:
             Tuple of (latitude, longitude) if found, None otherwise
         """
         for pattern in self.COORDINATE_PATTERNS:
-            match = re.search(pattern, query, re.IGNORECASE)
+            match = pattern.search(query)
             if match:
                 try:
-                    lat = float(match.group(1))
-                    lon = float(match.group(2))
+                    lat, lon = map(float, match.groups())
                     # Validate coordinate ranges
                     if -90 <= lat <= 90 and -180 <= lon <= 180:
                         return (lat, lon)
@@ -137,10 +183,10 @@ class SpatiotemporalExtractor:
             Tuple of (min_lon, min_lat, max_lon, max_lat) if found, None otherwise
         """
         for pattern in self.BBOX_PATTERNS:
-            match = re.search(pattern, query, re.IGNORECASE)
+            match = pattern.search(query)
             if match:
                 try:
-                    coords = [float(match.group(i)) for i in range(1, 5)]
+                    coords = list(map(float, match.groups()))
                     return coords
                 except (ValueError, IndexError):
                     continue
@@ -168,52 +214,53 @@ class SpatiotemporalExtractor:
                 }
 
         # Check for date range patterns
-        for pattern in self.DATE_RANGE_PATTERNS:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                try:
-                    if "from" in pattern or "between" in pattern:
-                        start_str = match.group(1).strip()
-                        end_str = match.group(2).strip()
-
-                        # Check if both are just years (4 digits)
-                        if re.match(r"^\d{4}$", start_str) and re.match(r"^\d{4}$", end_str):
-                            return {
-                                "start_date": f"{start_str}-01-01",
-                                "end_date": f"{end_str}-12-31",
-                            }
-
-                        start_date = date_parser.parse(start_str, fuzzy=True)
-                        end_date = date_parser.parse(end_str, fuzzy=True)
-                        return {
-                            "start_date": start_date.strftime("%Y-%m-%d"),
-                            "end_date": end_date.strftime("%Y-%m-%d"),
-                        }
-                    elif "since" in pattern or "after" in pattern:
-                        start_date = date_parser.parse(match.group(1), fuzzy=True)
-                        return {
-                            "start_date": start_date.strftime("%Y-%m-%d"),
-                            "end_date": datetime.now().strftime("%Y-%m-%d"),
-                        }
-                    elif "before" in pattern:
-                        end_date = date_parser.parse(match.group(1), fuzzy=True)
+        for tag, pattern in self.DATE_RANGE_PATTERNS:
+            match = pattern.search(query)
+            if not match:
+                continue
+            try:
+                if tag in ("from", "between"):
+                    start_str = match.group(1).strip()
+                    end_str = match.group(2).strip()
+
+                    # Check if both are just years (4 digits)
+                    if self.YEAR_PATTERN.match(start_str) and self.YEAR_PATTERN.match(end_str):
                         return {
-                            "end_date": end_date.strftime("%Y-%m-%d"),
+                            "start_date": f"{start_str}-01-01",
+                            "end_date": f"{end_str}-12-31",
                         }
-                    elif "in" in pattern and len(match.group(1)) == 4:
-                        year = match.group(1)
-                        return {
-                            "start_date": f"{year}-01-01",
-                            "end_date": f"{year}-12-31",
-                        }
-                    elif "during" in pattern:
-                        date = date_parser.parse(match.group(1), fuzzy=True)
-                        return {
-                            "start_date": date.strftime("%Y-%m-%d"),
-                            "end_date": date.strftime("%Y-%m-%d"),
-                        }
-                except (ValueError, AttributeError):
-                    continue
+
+                    start_date = _fast_parse(start_str)
+                    end_date = _fast_parse(end_str)
+                    return {
+                        "start_date": start_date.strftime("%Y-%m-%d"),
+                        "end_date": end_date.strftime("%Y-%m-%d"),
+                    }
+                elif tag in ("since", "after"):
+                    start_date = _fast_parse(match.group(1))
+                    return {
+                        "start_date": start_date.strftime("%Y-%m-%d"),
+                        "end_date": datetime.now().strftime("%Y-%m-%d"),
+                    }
+                elif tag == "before":
+                    end_date = _fast_parse(match.group(1))
+                    return {
+                        "end_date": end_date.strftime("%Y-%m-%d"),
+                    }
+                elif tag in ("in", "during") and len(match.group(1)) == 4:
+                    year = match.group(1)
+                    return {
+                        "start_date": f"{year}-01-01",
+                        "end_date": f"{year}-12-31",
+                    }
+                elif tag == "during":
+                    date = _fast_parse(match.group(1))
+                    return {
+                        "start_date": date.strftime("%Y-%m-%d"),
+                        "end_date": date.strftime("%Y-%m-%d"),
+                    }
+            except (ValueError, AttributeError):
+                continue
 
         return None
 
@@ -232,6 +279,26 @@ class SpatiotemporalExtractor:
             - temporal: dict (start_date, end_date)
             - query: str (original query)
         """
+        # Regex extraction is pure, relative dates ("last week") only change with the day
+        params = dict(self._extract_query_parameters_cached(query, date.today()))
+        if logger.isEnabledFor(logging.DEBUG):
+            # Hits, misses and current size, to size the cache against real traffic
+            logger.debug("Query parameter cache: %s", self._extract_query_parameters_cached.cache_info())
+        # Copy the mutable values so callers cannot alter the cached entry
+        if "bbox" in params:
+            params["bbox"] = list(params["bbox"])
+        if "temporal" in params:
+            params["temporal"] = dict(params["temporal"])
+
+        location = params.get("location")
+        if location and ("bbox" not in params and "coordinates" not in params):
+            params["bbox"] = self.extract_geolocation_bbox(location)
+            logger.info(f"Geocoding location: {location}, results in bbox: {params['bbox']}")
+
+        return params
+
+    def _extract_query_parameters(self, query: str, today: date) -> Dict[str, Any]:
+        """Regex-only extraction, today is only part of the cache key"""
         params = {
             "query": query,
         }
@@ -256,8 +323,4 @@ class SpatiotemporalExtractor:
         if temporal:
             params["temporal"] = temporal
 
-        if location and (not bbox and not coords):
-            params["bbox"] = self.extract_geolocation_bbox(location)
-            logger.info(f"Geocoding location: {location}, results in bbox: {params['bbox']}")
-
         return params
@@ -1,17 +1,16 @@
-import json
+import asyncio
 import logging
 import random
-import string
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-import aiofiles
 from fastmcp import FastMCP
 from pydantic import BaseModel
 
 from .dispatcher import QueryDispatcher
 from .extractor import SpatiotemporalExtractor
 from .virtual_dataset import get_smap_dataset, init_cluster, plot_seasonal_smap_area
+from .xkcd import XkcdIndex, reservoir_sample
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -22,6 +21,27 @@ extractor = SpatiotemporalExtractor()
 dispatcher = QueryDispatcher()
 docs_path = Path("./resources/earthaccess_api_full.md").resolve()
 
+RESOURCES_DIR = Path(__file__).parent / "resources"
+
+
+def _read_static_doc(path: Path) -> str:
+    """Read a bundled markdown file, returning the error message if it is missing"""
+    try:
+        return path.read_text(encoding="utf-8")
+    except Exception as e:
+        logger.error(f"Error loading {path}: {e}")
+        return f"File not found. {e}"
+
+
+# Static documentation, read once instead of on every tool or resource call
+_STATIC_DOCS: Dict[str, str] = {
+    "earthaccess_api": _read_static_doc(RESOURCES_DIR / "earthaccess_api_full.md"),
+    "agent": _read_static_doc(RESOURCES_DIR / "agent.md"),
+}
+
+# The dump is static, parse it once at import instead of on every tool call
+_XKCD = XkcdIndex(RESOURCES_DIR / "xkcd.ndjson")
+
 
 class Link(BaseModel):
     url: str
@@ -46,7 +66,7 @@ class DatasetSummary(BaseModel):
 
 
 @mcp.tool()
-def query_earth_collections(
+async def query_earth_collections(
     query: str,
     keywords: list[str],
     bbox: Optional[list[float]] = [-180.0, -90.0, 180.0, 90.0],
@@ -85,10 +105,11 @@ def query_earth_collections(
     - summary (dataset summary)
     - links (urls to data and documentation)
     """
-    params = extractor.extract_parameters(query)
+    # Geocoding and the catalog searches are blocking HTTP calls, keep them off the event loop
+    params = await asyncio.to_thread(extractor.extract_parameters, query)
     logger.info(f"Extracted parameters: {params}")
 
-    results = dispatcher.dispatch_collection_query(params, bbox, keywords, max_results, source)
+    results = await asyncio.to_thread(dispatcher.dispatch_collection_query, params, bbox, keywords, max_results, source)
 
     return results
 
@@ -96,12 +117,7 @@ def query_earth_collections(
 @mcp.tool()
 async def earthaccess_api() -> str:
     """Returns earthaccess API documentation."""
-    try:
-        async with aiofiles.open("./midstac/resources/earthaccess_api_full.md", mode="r") as f:
-            content = await f.read()
-        return content
-    except Exception as e:
-        return f"File not found. {e}"
+    return _STATIC_DOCS["earthaccess_api"]
 
 
 @mcp.tool()
@@ -110,38 +126,19 @@ async def get_companion_image(topic: str = "heatmap") -> list[str]:
     Returns up to 5 sample XKCD images related to a particular topic.
 
     """
-    matches = []
     topic_lower = topic.lower().strip()
 
     is_phrase = len(topic_lower.split()) > 1
 
-    try:
-        async with aiofiles.open("./midstac/resources/xkcd.ndjson", mode="r") as f:
-            async for line in f:
-                if not line.strip():
-                    continue
-                try:
-                    item = json.loads(line)
-                    transcript = item.get("transcript", "").lower()
-                    alt = item.get("alt", "").lower()
-
-                    if is_phrase:
-                        if topic_lower in transcript or topic_lower in alt:
-                            matches.append(f"![XKCD image {item.get('num')}]({item.get('img')})")
-                    else:
-                        words = [
-                            w.strip(string.punctuation) for w in transcript.split() + alt.split()
-                        ]
-                        if topic_lower in words:
-                            matches.append(f"![XKCD image {item.get('num')}]({item.get('img')})")
-
-                except json.JSONDecodeError as e:
-                    logger.warning(f"Skipping malformed line: {e}")
-    except Exception as e:
-        logger.error(f"Error loading xkcd.ndjson: {e}")
+    if is_phrase:
+        positions = reservoir_sample(_XKCD.phrase_matches(topic_lower), 5)
+    else:
+        word_positions = _XKCD.word_matches(topic_lower)
+        positions = random.sample(word_positions, min(5, len(word_positions)))
+    matches = [_XKCD.images[i] for i in positions]
 
     if matches:
-        return random.sample(matches, min(5, len(matches)))
+        return matches
 
     return ["![Methodology](https://imgs.xkcd.com/comics/ai_methodology.png)"]
 
@@ -168,7 +165,7 @@ def plot_smap_area(
       - Aggregates the data yearly using the specified operation (mean, std, median, min, max, sum, var).
       - Reprojects the data to Web Mercator (EPSG:3857) for visualization.
       - Overlays the yearly data on an OpenStreetMap base layer using GeoViews/HoloViews.
-      - Saves the final map as "output.png".
+      - Renders the final map to PNG in memory and uploads it to imgbb.
 
     Args:
         varname (str): Name of the variable in the xarray Dataset to plot. e.g. sm_surface_wetness
@@ -207,23 +204,13 @@ def plot_smap_area(
 @mcp.tool()
 async def search_instructions() -> str:
     """Returns instruction on how an agent should use midstac"""
-    try:
-        async with aiofiles.open("./midstac/resources/agent.md", mode="r") as f:
-            content = await f.read()
-        return content
-    except Exception as e:
-        return f"File not found. {e}"
+    return _STATIC_DOCS["agent"]
 
 
 @mcp.resource(f"file://{docs_path.as_posix()}", mime_type="text/markdown")
 async def earthaccess_docs() -> str:
     """Returns earthaccess API documentation."""
-    try:
-        async with aiofiles.open("./midstac/resources/earthaccess_api_full.md", mode="r") as f:
-            content = await f.read()
-        return content
-    except Exception as e:
-        return f"Log file not found. {e}"
+    return _STATIC_DOCS["earthaccess_api"]
 
 
 def main():
@@ -1,5 +1,6 @@
 # data access and processing
 import earthaccess as ea
+import numpy as np
 import xarray as xr
 import fsspec
 import calendar
@@ -7,29 +8,80 @@ import requests
 import zarr
 import warnings
 import logging
+import io
 import os
+import threading
+from typing import BinaryIO
+import atexit
 
 
 # distributed compute
 from dask.distributed import Client, LocalCluster
 
 # plotting
-from holoviews import HoloMap
-import holoviews as hv
-import geoviews as gv
+import matplotlib
+
+# Headless server, select the raster backend before holoviews loads pyplot
+matplotlib.use("Agg")
+
 import cartopy.crs as ccrs
+import geoviews as gv
+import holoviews as hv
+from holoviews import HoloMap
+from holoviews.operation.datashader import rasterize
+from pyproj import Transformer
 
 auth = ea.login()
 hv.extension("matplotlib")
+# Opened lazily by get_smap_dataset, the reference store is read-only so one handle is enough
 ds = None
+_ds_lock = threading.Lock()
+# Shared by every plot, create_dask_cluster starts them on first use
+client = None
+cluster = None
+_cluster_lock = threading.Lock()
 
 API_KEY_IMGBB = os.getenv("IMGBB_API_KEY")
+# Keeps the TLS connection to imgbb alive between uploads
+_imgbb_session = requests.Session()
+atexit.register(_imgbb_session.close)
+
+# Built once, PROJ pipelines are costly to set up on every plot
+_WGS84_TO_EASE2 = Transformer.from_crs(4326, 6933, always_xy=True)
+_WEB_MERCATOR = ccrs.epsg(3857)
+
+# Reductions over the time dimension supported by plot_seasonal_smap_area
+_OPS = {
+    "std": xr.DataArray.std,
+    "mean": xr.DataArray.mean,
+    "median": xr.DataArray.median,
+    "min": xr.DataArray.min,
+    "max": xr.DataArray.max,
+    "sum": xr.DataArray.sum,
+    "var": xr.DataArray.var,
+}
+
+_OP_LABELS = {
+    "std": "Std Dev",
+    "mean": "Mean",
+    "median": "Median",
+    "min": "Min",
+    "max": "Max",
+    "sum": "Sum",
+    "var": "Variance",
+}
+
+# Two-pass and order statistics reduce better with the whole season in one chunk
+_FULL_TIME_OPS = frozenset({"std", "var", "median"})
+_FULL_TIME_CHUNKS = {"time": -1, "x": 256, "y": 256}
 
 
 def create_dask_cluster(environment="local", n_workers=4, cloud_opts={}):
-    if "client" in locals() and "cluster" in locals():
-        return (client, cluster)
-    else:
+    global client, cluster
+
+    with _cluster_lock:
+        if client is not None and cluster is not None:
+            return (client, cluster)
         print("Creating new local Dask client")
         cluster = LocalCluster(
             n_workers=n_workers, threads_per_worker=1, silence_logs=logging.ERROR
@@ -45,14 +97,17 @@ def silence_worker_warnings():
         logging.getLogger(name).setLevel(logging.ERROR)
 
 
-def upload_image_to_imgbb(image_path: str) -> str:
-    """Upload image to imgbb.com and return the hosted URL."""
-    with open(image_path, "rb") as f:
-        image_bytes = f.read()
-    response = requests.post(
+def _reduce_tile(da: xr.DataArray, operation: str) -> xr.DataArray:
+    """Reduce one spatial tile holding the whole season along time"""
+    return _OPS[operation](da, dim="time")
+
+
+def upload_image_to_imgbb(image: BinaryIO) -> str:
+    """Upload an in-memory PNG to imgbb.com and return the hosted URL."""
+    response = _imgbb_session.post(
         "https://api.imgbb.com/1/upload",
         params={"key": API_KEY_IMGBB},
-        files={"image": image_bytes},
+        files={"image": ("output.png", image, "image/png")},
     )
     response.raise_for_status()
     return response.json()["data"]["url"]
@@ -61,85 +116,68 @@ def upload_image_to_imgbb(image_path: str) -> str:
 def plot_seasonal_smap_area(
     ds, varname, lat_min, lat_max, lon_min, lon_max, month_start, month_end, year, operation="std"
 ) -> str:
-    WGS84 = ccrs.PlateCarree()
-    EASEGrid2 = ccrs.epsg(6933)
-    x_min, y_min = EASEGrid2.transform_point(lon_min, lat_min, WGS84)
-    x_max, y_max = EASEGrid2.transform_point(lon_max, lat_max, WGS84)
+    (x_min, x_max), (y_min, y_max) = _WGS84_TO_EASE2.transform((lon_min, lon_max), (lat_min, lat_max))
     if y_min > y_max:
         y_min, y_max = y_max, y_min
-    ds_bbox = ds[varname].sel(
-        x=ds.x[(ds.x >= x_min) & (ds.x <= x_max)], y=ds.y[(ds.y >= y_min) & (ds.y <= y_max)]
-    )
+    # Label slices map to contiguous chunk reads, the grid rows usually run north to south
+    x_slice = slice(x_max, x_min) if ds.indexes["x"].is_monotonic_decreasing else slice(x_min, x_max)
+    y_slice = slice(y_max, y_min) if ds.indexes["y"].is_monotonic_decreasing else slice(y_min, y_max)
+    ds_bbox = ds[varname].sel(x=x_slice, y=y_slice)
 
     if len(ds_bbox.x) == 0 or len(ds_bbox.y) == 0:
         print("ERROR: No data in selected region!")
         return None
 
-    # Filter by year
-    ds_year = ds_bbox.sel(time=ds_bbox.time.dt.year == year)
-
-    # Filter by season
+    # Filter by year and season with contiguous time ranges instead of boolean masks
     if month_end < month_start:
-        mask = (ds_year.time.dt.month >= month_start) | (ds_year.time.dt.month <= month_end)
+        # The season wraps the new year, keep both ends of the same calendar year
+        month_ranges = [(1, month_end), (month_start, 12)]
     else:
-        mask = (ds_year.time.dt.month >= month_start) & (ds_year.time.dt.month <= month_end)
-    ds_seasonal = ds_year.sel(time=mask)
+        month_ranges = [(month_start, month_end)]
+
+    time_index = ds_bbox.indexes["time"]
+    seasonal_slices = tuple(time_index.slice_indexer(f"{year}-{start:02d}", f"{year}-{end:02d}") for start, end in month_ranges)
+    # Both ends of a wrapping season become one positional selection instead of an xr.concat
+    ds_seasonal = ds_bbox.isel(time=seasonal_slices[0] if len(seasonal_slices) == 1 else np.r_[seasonal_slices])
 
     if len(ds_seasonal.time) == 0:
         print("No data in selected time period!")
         return None
 
-    # Define operations that work directly on time dimension
-    operations = {
-        "std": lambda x: x.std(dim="time"),
-        "mean": lambda x: x.mean(dim="time"),
-        "median": lambda x: x.median(dim="time"),
-        "min": lambda x: x.min(dim="time"),
-        "max": lambda x: x.max(dim="time"),
-        "sum": lambda x: x.sum(dim="time"),
-        "var": lambda x: x.var(dim="time"),
-    }
-
-    if operation not in operations:
-        print(f"Operation {operation} not supported. Choose from: {list(operations.keys())}")
+    if operation not in _OPS:
+        print(f"Operation {operation} not supported. Choose from: {list(_OPS.keys())}")
         return None
 
-    # Apply operation directly (no groupby needed)
-    yearly_agg = operations[operation](ds_seasonal)
+    if operation in _FULL_TIME_OPS:
+        # One chunk along time lets each worker reduce its spatial tile without an aggregation tree,
+        # map_blocks makes that a single read-and-reduce task per tile
+        ds_seasonal = ds_seasonal.chunk(_FULL_TIME_CHUNKS)
+        template = ds_seasonal.isel(time=0, drop=True)
+        reduced = xr.map_blocks(_reduce_tile, ds_seasonal, args=(operation,), template=template)
+    else:
+        reduced = _OPS[operation](ds_seasonal, dim="time")
 
-    operation_labels = {
-        "std": "Std Dev",
-        "mean": "Mean",
-        "median": "Median",
-        "min": "Min",
-        "max": "Max",
-        "sum": "Sum",
-        "var": "Variance",
-    }
-    clabel = operation_labels[operation]
+    # Apply operation directly (no groupby needed), computing it once on the Dask
+    # cluster so plotting gets a NumPy array instead of re-triggering the graph
+    yearly_agg = reduced.compute()
+    clabel = _OP_LABELS[operation]
 
     # Create mesh for the single year
-    mesh = gv.QuadMesh(yearly_agg, kdims=["x", "y"], vdims=varname, crs=ccrs.epsg(3857))
+    mesh = gv.QuadMesh(yearly_agg, kdims=["x", "y"], vdims=varname, crs=_WEB_MERCATOR)
 
-    operation_labels = {
-        "std": "Std Dev",
-        "mean": "Mean",
-        "median": "Median",
-        "min": "Min",
-        "max": "Max",
-        "sum": "Sum",
-        "var": "Variance",
-    }
-    clabel = operation_labels[operation]
+    # Aggregate the grid onto a fixed canvas rather than drawing one polygon per cell
+    raster = rasterize(mesh, width=1200, height=800, dynamic=False)
 
-    holomap = HoloMap({year: mesh}, kdims="year")
+    holomap = HoloMap({year: raster}, kdims="year")
 
     title_text = f"Surface Wetness {clabel} by Year: {year} | Months: {calendar.month_name[month_start]}–{calendar.month_name[month_end]}"
     overlay_figure = holomap.opts(
         cmap="YlOrRd_r", colorbar=True, clabel=clabel, alpha=0.7, title=title_text, fontscale=0.8
     )
-    hv.save(overlay_figure, "output.png", dpi=150)
-    image_url = upload_image_to_imgbb("output.png")
+    # Render into memory, concurrent calls no longer share an output.png on disk
+    buf = io.BytesIO()
+    hv.save(overlay_figure, buf, fmt="png", dpi=150)
+    image_url = upload_image_to_imgbb(buf)
     return f"![SMAP plot using virtual access]({image_url})"
 
 
@@ -158,6 +196,28 @@ def init_cluster():
 
 
 def get_smap_dataset():
+    """Open the SMAP virtual dataset once and share the handle across calls"""
+    global ds
+
+    if ds is None:
+        with _ds_lock:
+            if ds is None:
+                ds = _open_smap_dataset()
+    return ds
+
+
+def close_smap_dataset():
+    global ds
+
+    if ds is not None:
+        ds.close()
+        ds = None
+
+
+atexit.register(close_smap_dataset)
+
+
+def _open_smap_dataset():
     refs = "https://its-live-data.s3-us-west-2.amazonaws.com/test-space/vds/SPL4SMGP.parquet"
     daac_fs = ea.get_fsspec_https_session()
 
@@ -170,5 +230,9 @@ def get_smap_dataset():
     )
 
     store = zarr.storage.FsspecStore(fs, read_only=True)
+    # Array metadata lives in the reference parquet loaded above, so it is already
+    # read in one request and a consolidated .zmetadata key would not exist.
+    # CF decoding stays on: time selection needs datetimes and the fill values
+    # must be masked before std/mean are computed.
     ds = xr.open_zarr(store, consolidated=False)
     return ds
@@ -0,0 +1,99 @@
+"""
+Search structures over the bundled xkcd ndjson dump
+"""
+
+import logging
+import random
+import string
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+class XkcdIndex:
+    """In-memory search structures over the xkcd ndjson dump"""
+
+    # Joins transcripts and alt texts in the search buffer, topics never contain it
+    SEPARATOR = "\x00"
+
+    def __init__(self, path: Path):
+        # Markdown image per comic, positions in here identify comics everywhere else
+        self.images: List[str] = []
+        # word -> positions of comics whose transcript or alt text use it
+        self.word_index: Dict[str, List[int]] = {}
+        # Every lowercased transcript and alt text in one buffer, with each comic's start offset
+        self.text = ""
+        self.offsets: List[int] = []
+
+        try:
+            lines = path.read_bytes().splitlines()
+        except Exception as e:
+            logger.error(f"Error loading xkcd.ndjson: {e}")
+            return
+
+        texts = []
+        offset = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                # orjson decodes the raw bytes without a str round trip
+                item = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                logger.warning(f"Skipping malformed line: {e}")
+                continue
+
+            transcript = item.get("transcript", "").lower()
+            alt = item.get("alt", "").lower()
+            position = len(self.images)
+            self.images.append(f"![XKCD image {item.get('num')}]({item.get('img')})")
+            # Whitespace tokens stripped of surrounding punctuation, so "e-mail" and "don't" stay whole
+            words = {word.strip(string.punctuation) for word in transcript.split()}
+            words.update(word.strip(string.punctuation) for word in alt.split())
+            words.discard("")
+            for word in words:
+                self.word_index.setdefault(word, []).append(position)
+
+            text = f"{transcript}{self.SEPARATOR}{alt}{self.SEPARATOR}"
+            texts.append(text)
+            self.offsets.append(offset)
+            offset += len(text)
+
+        self.text = "".join(texts)
+
+    def word_matches(self, word: str) -> List[int]:
+        """Positions of comics using word in their transcript or alt text"""
+        positions = self.word_index.get(word)
+        if positions is None and word.strip(string.punctuation) != word:
+            # Indexing strips edge punctuation ("c++" becomes "c"), look for the raw text instead
+            return list(self.phrase_matches(word))
+        return positions or []
+
+    def phrase_matches(self, phrase: str) -> Iterator[int]:
+        """Positions of comics containing phrase, found with str.find over the whole buffer"""
+        if not phrase:
+            return
+        hit = self.text.find(phrase)
+        while hit != -1:
+            position = bisect_right(self.offsets, hit) - 1
+            yield position
+            # Resume at the next comic so each one is reported once
+            if position + 1 == len(self.offsets):
+                return
+            hit = self.text.find(phrase, self.offsets[position + 1])
+
+
+def reservoir_sample(items, k: int) -> list:
+    """Uniformly sample up to k items from an iterable without materializing it"""
+    sample = []
+    for seen, item in enumerate(items):
+        if seen < k:
+            sample.append(item)
+        else:
+            replace = random.randint(0, seen)
+            if replace < k:
+                sample[replace] = item
+    return sample
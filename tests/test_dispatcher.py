@@ -1,4 +1,15 @@
-from midstac.dispatcher import QueryDispatcher
+import warnings
+from types import SimpleNamespace
+
+import pystac
+from pystac_client import Client
+
+from midstac import dispatcher
+from midstac.dispatcher import STAC_TIMEOUT, DatasetSummary, QueryDispatcher, is_valid_url, normalize_keywords
+
+
+def make_summary(source, id):
+    return DatasetSummary(source=source, id=id, title=id, summary="")
 
 
 class TestQueryDispatcher:
@@ -18,3 +29,113 @@ class TestQueryDispatcher:
         assert "nasa" in self.dispatcher.STAC_CATALOGS
         assert "earth_search" in self.dispatcher.STAC_CATALOGS
         assert "planetary_computer" in self.dispatcher.STAC_CATALOGS
+
+    def test_dispatch_deduplicates_results(self):
+        """Test collections found by several keywords are returned once, capped per source"""
+        self.dispatcher.auth = SimpleNamespace(authenticated=True)
+        self.dispatcher.search_earthaccess_collections = lambda keyword, **kwargs: [
+            make_summary("NASA CMR", "C-shared"),
+            make_summary("NASA CMR", f"C-{keyword}"),
+        ]
+        self.dispatcher.search_stac_collections = lambda keywords, **kwargs: [
+            make_summary("STAC", "shared"),
+            None,
+            make_summary("STAC", " or ".join(keywords)),
+        ]
+
+        params = {"query": "snow cover"}
+        results = self.dispatcher.dispatch_collection_query(params, None, ["snow", "ice", "glacier"], max_results=3)
+
+        assert [(r.source, r.id) for r in results] == [
+            ("NASA CMR", "C-shared"),
+            ("NASA CMR", "C-snow"),
+            ("NASA CMR", "C-ice"),
+            ("STAC", "shared"),
+            ("STAC", "snow or ice or glacier"),
+        ]
+
+    def test_dispatch_keeps_explicit_keywords(self):
+        """Test keywords passed by the caller are only lowercased and deduplicated"""
+        self.dispatcher.auth = SimpleNamespace(authenticated=True)
+        searched = []
+        self.dispatcher.search_earthaccess_collections = lambda keyword, **kwargs: searched.append(keyword) or []
+        self.dispatcher.search_stac_collections = lambda keywords, **kwargs: []
+
+        params = {"query": "ozone and soil moisture over the Amazon"}
+        keywords = ["O3", "SM", "ET", "o3", "ndvi", "lst", "sif"]
+        self.dispatcher.dispatch_collection_query(params, None, keywords, source="nasa")
+
+        assert searched == ["o3", "sm", "et", "ndvi", "lst", "sif"]
+
+    def test_dispatch_logs_in_once(self, monkeypatch):
+        """Test a failed login is not retried from every search worker"""
+        logins = []
+        monkeypatch.setattr(dispatcher.earthaccess, "login", lambda: logins.append(1) or SimpleNamespace(authenticated=False))
+        monkeypatch.setattr(dispatcher.earthaccess, "search_datasets", lambda **kwargs: [])
+        self.dispatcher.auth = SimpleNamespace(authenticated=False)
+
+        params = {"query": "snow"}
+        self.dispatcher.dispatch_collection_query(params, None, ["snow", "ice", "glacier"], source="nasa")
+
+        assert len(logins) == 1
+
+    def test_dispatch_normalizes_query_tokens(self):
+        """Test keywords taken from the free-text query drop stopwords and short tokens"""
+        self.dispatcher.auth = SimpleNamespace(authenticated=True)
+        searched = []
+        self.dispatcher.search_earthaccess_collections = lambda keyword, **kwargs: searched.append(keyword) or []
+
+        params = {"query": "snow in the Alps"}
+        self.dispatcher.dispatch_collection_query(params, None, [], source="nasa")
+
+        assert searched == ["snow", "alps"]
+
+
+class TestOpenCatalog:
+    """Test the shared STAC catalog cache"""
+
+    def test_keeps_stac_timeout(self, monkeypatch):
+        """Test opening a catalog does not reset the timeout of the shared StacApiIO"""
+        monkeypatch.setattr(pystac.Catalog, "from_file", classmethod(lambda cls, href, stac_io=None: Client(id="stub", description="stub")))
+        dispatcher._open_catalog.cache_clear()
+        try:
+            with warnings.catch_warnings():
+                # The stub root advertises no conformance classes
+                warnings.simplefilter("ignore")
+                dispatcher._open_catalog("https://example.com/stac")
+            assert dispatcher._STAC_IO.timeout == STAC_TIMEOUT
+        finally:
+            dispatcher._open_catalog.cache_clear()
+
+
+class TestIsValidUrl:
+    """Test the is_valid_url helper"""
+
+    def test_accepts_http_urls(self):
+        """Test http and https links with a host are accepted"""
+        assert is_valid_url("https://example.com/collection.json")
+        assert is_valid_url("http://example.com")
+        assert is_valid_url("HTTPS://example.com/path?q=1")
+
+    def test_rejects_other_targets(self):
+        """Test relative, non-http and hostless targets are rejected"""
+        assert not is_valid_url("./collection.json")
+        assert not is_valid_url("s3://bucket/key.tif")
+        assert not is_valid_url("https:///no-host")
+        assert not is_valid_url("")
+        assert not is_valid_url(None)
+
+
+class TestNormalizeKeywords:
+    """Test keyword normalization before the search fan-out"""
+
+    def test_drops_stopwords_and_duplicates(self):
+        """Test stopwords, short tokens and repeats are removed in order"""
+        keywords = "Find the Landsat data over California from 2020 to 2021 landsat".split()
+        assert normalize_keywords(keywords) == ["find", "landsat", "california", "2020", "2021"]
+
+    def test_caps_keyword_count(self):
+        """Test the number of keywords is capped"""
+        keywords = ["ndvi", "snow cover", "sea ice", "land use", "icesat", "gedi"]
+        assert normalize_keywords(keywords) == ["ndvi", "snow cover", "sea ice", "land use", "icesat"]
+        assert normalize_keywords(keywords, max_keywords=2) == ["ndvi", "snow cover"]
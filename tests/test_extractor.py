@@ -1,6 +1,27 @@
 from midstac.extractor import SpatiotemporalExtractor
 
 
+class FakeGeocodingSession:
+    """Stands in for requests.Session and counts geocoding calls"""
+
+    def __init__(self, bbox):
+        self.bbox = bbox
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        bbox = self.bbox
+
+        class Response:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return {"features": [{"bbox": bbox}]}
+
+        return Response()
+
+
 class TestSpatiotemporalExtractor:
     """Test the SpatiotemporalExtractor class"""
 
@@ -76,3 +97,64 @@ class TestSpatiotemporalExtractor:
         assert temporal is not None
         assert temporal["start_date"] == "2021-01-01"
         assert temporal["end_date"] == "2021-12-31"
+
+    def test_extract_temporal_mixed_keywords(self):
+        """Test from/between ranges win over open-ended keywords earlier in the query"""
+        query = "after 2015 from 2016 to 2017"
+        temporal = self.extractor.extract_temporal(query)
+        assert temporal == {"start_date": "2016-01-01", "end_date": "2017-12-31"}
+
+        query = "precipitation after the flood from 2019 to 2021"
+        temporal = self.extractor.extract_temporal(query)
+        assert temporal == {"start_date": "2019-01-01", "end_date": "2021-12-31"}
+
+        query = "snow during summer from 2019 to 2021"
+        temporal = self.extractor.extract_temporal(query)
+        assert temporal == {"start_date": "2019-01-01", "end_date": "2021-12-31"}
+
+        query = "before 2018 between 2019 and 2020"
+        temporal = self.extractor.extract_temporal(query)
+        assert temporal == {"start_date": "2019-01-01", "end_date": "2020-12-31"}
+
+    def test_extract_location_pattern_order(self):
+        """Test "in" locations take precedence over earlier "at" or "near" mentions"""
+        query = "Data at Yosemite in California"
+        location = self.extractor.extract_location(query)
+        assert location == "California"
+
+    def test_extract_temporal_iso_prefix(self):
+        """Test partial ISO dates default to the first day of the period"""
+        query = "since 2019-03"
+        temporal = self.extractor.extract_temporal(query)
+        assert temporal is not None
+        assert temporal["start_date"] == "2019-03-01"
+
+        query = "before 2018"
+        temporal = self.extractor.extract_temporal(query)
+        assert temporal == {"end_date": "2018-01-01"}
+
+        # Free form dates still go through dateutil
+        query = "after March 5 2020"
+        temporal = self.extractor.extract_temporal(query)
+        assert temporal["start_date"] == "2020-03-05"
+
+    def test_extract_geolocation_bbox_cached(self):
+        """Test repeated geocoding of the same place only hits the API once"""
+        session = FakeGeocodingSession([-124.4, 32.5, -114.1, 42.0])
+        self.extractor._session = session
+
+        assert self.extractor.extract_geolocation_bbox("California") == [-124.4, 32.5, -114.1, 42.0]
+        assert self.extractor.extract_geolocation_bbox(" california ") == [-124.4, 32.5, -114.1, 42.0]
+        assert session.calls == 1
+
+    def test_extract_parameters_returns_independent_copies(self):
+        """Test repeated queries are served from the cache without sharing mutable values"""
+        query = "Get satellite data in bbox [-122.5, 37.5, -122.0, 38.0] from 2020 to 2021"
+        first = self.extractor.extract_parameters(query)
+        first["bbox"].append(0.0)
+        first["temporal"]["start_date"] = "1900-01-01"
+
+        second = self.extractor.extract_parameters(query)
+        assert second["bbox"] == [-122.5, 37.5, -122.0, 38.0]
+        assert second["temporal"] == {"start_date": "2020-01-01", "end_date": "2021-12-31"}
+        assert self.extractor._extract_query_parameters_cached.cache_info().hits == 1
@@ -0,0 +1,100 @@
+import orjson
+
+from midstac.xkcd import XkcdIndex, reservoir_sample
+
+COMICS = [
+    {"num": 1, "img": "https://imgs.xkcd.com/comics/1.png", "transcript": "A heatmap of my sleep", "alt": "It glows red"},
+    {"num": 2, "img": "https://imgs.xkcd.com/comics/2.png", "transcript": "Climate change is real", "alt": "So is cloud cover"},
+    {"num": 3, "img": "https://imgs.xkcd.com/comics/3.png", "transcript": "cloud cover, cloud cover", "alt": "Heatmap again"},
+    {"num": 4, "img": "https://imgs.xkcd.com/comics/4.png", "transcript": "'Hello', I said by e-mail in C++", "alt": "Café, dogs' toys"},
+    {"num": 5, "img": "https://imgs.xkcd.com/comics/5.png", "transcript": "The end", "alt": "sea ice in the last comic"},
+]
+
+
+def write_ndjson(path, lines):
+    path.write_bytes(b"\n".join(lines) + b"\n")
+    return path
+
+
+class TestXkcdIndex:
+    """Test the xkcd search index"""
+
+    def setup_method(self):
+        """Set up test fixtures"""
+        self.lines = [orjson.dumps(comic) for comic in COMICS]
+
+    def test_images(self, tmp_path):
+        """Test every comic gets a markdown image in file order"""
+        index = XkcdIndex(write_ndjson(tmp_path / "xkcd.ndjson", self.lines))
+        assert index.images[0] == "![XKCD image 1](https://imgs.xkcd.com/comics/1.png)"
+        assert len(index.images) == 5
+
+    def test_word_matches(self, tmp_path):
+        """Test words are found case-insensitively in transcripts and alt texts"""
+        index = XkcdIndex(write_ndjson(tmp_path / "xkcd.ndjson", self.lines))
+        assert index.word_matches("heatmap") == [0, 2]
+        assert index.word_matches("glows") == [0]
+        assert index.word_matches("missing") == []
+
+    def test_word_matches_punctuation(self, tmp_path):
+        """Test surrounding punctuation is ignored while inner punctuation and accents are kept"""
+        index = XkcdIndex(write_ndjson(tmp_path / "xkcd.ndjson", self.lines))
+        assert index.word_matches("e-mail") == [3]
+        assert index.word_matches("hello") == [3]
+        assert index.word_matches("dogs") == [3]
+        assert index.word_matches("café") == [3]
+        assert index.word_matches("c++") == [3]
+        assert index.word_matches("mail") == []
+
+    def test_phrase_matches(self, tmp_path):
+        """Test phrases at the end of a transcript or inside the alt text are found"""
+        index = XkcdIndex(write_ndjson(tmp_path / "xkcd.ndjson", self.lines))
+        assert list(index.phrase_matches("is real")) == [1]
+        assert list(index.phrase_matches("cloud cover")) == [1, 2]
+
+    def test_phrase_repeated_in_one_comic(self, tmp_path):
+        """Test a phrase that repeats within one comic is reported once"""
+        index = XkcdIndex(write_ndjson(tmp_path / "xkcd.ndjson", self.lines))
+        assert list(index.phrase_matches("cloud cover, cloud")) == [2]
+        assert list(index.phrase_matches("cover")) == [1, 2]
+
+    def test_phrase_in_last_comic(self, tmp_path):
+        """Test a phrase in the last comic is found"""
+        index = XkcdIndex(write_ndjson(tmp_path / "xkcd.ndjson", self.lines))
+        assert list(index.phrase_matches("last comic")) == [4]
+
+    def test_phrase_does_not_span_fields(self, tmp_path):
+        """Test phrases cannot straddle the transcript, alt text or comic boundaries"""
+        index = XkcdIndex(write_ndjson(tmp_path / "xkcd.ndjson", self.lines))
+        assert list(index.phrase_matches("sleep it")) == []
+        assert list(index.phrase_matches("red climate")) == []
+        assert list(index.phrase_matches("")) == []
+
+    def test_skips_malformed_lines(self, tmp_path):
+        """Test blank and malformed lines are skipped without shifting positions"""
+        lines = [self.lines[0], b"", b"{not json", self.lines[1]]
+        index = XkcdIndex(write_ndjson(tmp_path / "xkcd.ndjson", lines))
+        assert len(index.images) == 2
+        assert list(index.phrase_matches("is real")) == [1]
+
+    def test_missing_file(self, tmp_path):
+        """Test a missing dump leaves an empty index"""
+        index = XkcdIndex(tmp_path / "missing.ndjson")
+        assert index.images == []
+        assert index.word_matches("heatmap") == []
+        assert list(index.phrase_matches("heatmap")) == []
+
+
+class TestReservoirSample:
+    """Test the reservoir_sample helper"""
+
+    def test_returns_all_items_when_fewer_than_k(self):
+        """Test short iterables are returned whole"""
+        assert reservoir_sample(iter([1, 2, 3]), 5) == [1, 2, 3]
+
+    def test_samples_k_distinct_items(self):
+        """Test long iterables yield k distinct items drawn from them"""
+        sample = reservoir_sample(iter(range(100)), 5)
+        assert len(sample) == 5
+        assert len(set(sample)) == 5
+        assert all(0 <= item < 100 for item in sample)